@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import re
+import fastapi
+from fastapi import Request
+
+router = fastapi.APIRouter()
+
+# Requêtes simultanées et profondeur de file par groupe de routes (surchargeables par variables d'environnement)
+DEVICE_LIST_CONCURRENCY = int(os.getenv("ADMISSION_DEVICE_LIST_CONCURRENCY", 2))
+DEVICE_LIST_QUEUE_DEPTH = int(os.getenv("ADMISSION_DEVICE_LIST_QUEUE_DEPTH", 16))
+BATTERY_FORECAST_CONCURRENCY = int(os.getenv("ADMISSION_BATTERY_FORECAST_CONCURRENCY", 1))
+BATTERY_FORECAST_QUEUE_DEPTH = int(os.getenv("ADMISSION_BATTERY_FORECAST_QUEUE_DEPTH", 8))
+WRITE_CONCURRENCY = int(os.getenv("ADMISSION_WRITE_CONCURRENCY", 4))
+WRITE_QUEUE_DEPTH = int(os.getenv("ADMISSION_WRITE_QUEUE_DEPTH", 32))
+READ_CONCURRENCY = int(os.getenv("ADMISSION_READ_CONCURRENCY", 8))
+READ_QUEUE_DEPTH = int(os.getenv("ADMISSION_READ_QUEUE_DEPTH", 64))
+# Délai suggéré au client lorsque la requête est rejetée (en secondes)
+RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", 1))
+
+
+class RouteLimit:
+    """Limite de concurrence d'un groupe de routes, avec file d'attente bornée.
+
+    Les requêtes GET identiques d'un groupe `coalesce` partagent une seule exécution.
+    """
+
+    def __init__(self, name, methods, path, concurrency, queue_depth, coalesce=False):
+        self.name = name
+        self.methods = set(methods)
+        self.path = re.compile(path)
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.coalesce = coalesce
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.pending = {}
+        # Métriques
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.coalesced = 0
+
+    def matches(self, method, path):
+        return method in self.methods and self.path.match(path) is not None
+
+    def metrics(self):
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced
+        }
+
+
+# Configuration par défaut : la liste complète des dispositifs est isolée des autres routes
+def default_route_limits():
+    return [
+        RouteLimit("device_list", ["GET"], r"^/devices/?$",
+                   DEVICE_LIST_CONCURRENCY, DEVICE_LIST_QUEUE_DEPTH, coalesce=True),
+        RouteLimit("battery_forecast", ["GET"], r"^/battery/forecast/?$",
+                   BATTERY_FORECAST_CONCURRENCY, BATTERY_FORECAST_QUEUE_DEPTH, coalesce=True),
+        RouteLimit("writes", ["POST", "PUT", "PATCH", "DELETE"], r"^/",
+                   WRITE_CONCURRENCY, WRITE_QUEUE_DEPTH),
+        RouteLimit("reads", ["GET"], r"^/(devices|users)",
+                   READ_CONCURRENCY, READ_QUEUE_DEPTH),
+    ]
+
+
+class AdmissionControlMiddleware:
+    """Middleware ASGI : limite la concurrence par route et rejette (503) quand la file est pleine."""
+
+    def __init__(self, app, limits, retry_after=RETRY_AFTER_SECONDS):
+        self.app = app
+        self.limits = limits
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = next((l for l in self.limits if l.matches(scope["method"], scope["path"])), None)
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        if limit.coalesce and scope["method"] == "GET":
+            return await self._coalesce(limit, scope, receive, send)
+        return await self._admit(limit, scope, receive, send)
+
+    # Retourne False si la requête a été rejetée sans être exécutée
+    async def _admit(self, limit, scope, receive, send):
+        # File pleine : rejet immédiat plutôt que d'occuper le pool de connexions
+        if limit.semaphore.locked():
+            if limit.waiting >= limit.queue_depth:
+                limit.rejected += 1
+                await self._reject(send)
+                return False
+            limit.queued += 1
+
+        limit.waiting += 1
+        try:
+            await limit.semaphore.acquire()
+        finally:
+            limit.waiting -= 1
+
+        limit.admitted += 1
+        limit.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.in_flight -= 1
+            limit.semaphore.release()
+        return True
+
+    async def _coalesce(self, limit, scope, receive, send):
+        key = (scope["path"], scope["query_string"])
+        shared = limit.pending.get(key)
+        if shared is not None:
+            messages = await asyncio.shield(shared)
+            # L'exécution partagée a échoué ou a été rejetée : chaque requête passe sa propre admission
+            if messages is None:
+                return await self._admit(limit, scope, receive, send)
+            limit.coalesced += 1
+            return await self._replay(messages, send)
+
+        shared = asyncio.get_running_loop().create_future()
+        limit.pending[key] = shared
+        messages = []
+
+        async def capture(message):
+            messages.append(message)
+
+        try:
+            admitted = await self._admit(limit, scope, receive, capture)
+        except BaseException:
+            shared.set_result(None)
+            raise
+        finally:
+            del limit.pending[key]
+
+        # Un rejet (503) n'est pas partagé avec les requêtes en attente
+        shared.set_result(messages if admitted else None)
+        await self._replay(messages, send)
+
+    async def _replay(self, messages, send):
+        for message in messages:
+            await send(message)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server busy, please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Métriques d'admission : requêtes en file, rejetées et mutualisées par groupe de routes
+@router.get("/metrics/admission")
+def get_admission_metrics(request: Request):
+    return {limit.name: limit.metrics() for limit in request.app.state.admission_limits}
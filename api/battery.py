@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+import fastapi
+import numpy as np
+from fastapi import Depends, Query
+from sqlalchemy import select, func, cast, Float, literal_column
+from sqlalchemy.orm import Session
+from db.db_setup import get_db
+from db.models.devices import Device, BatterySample
+from datetime import datetime, timedelta, timezone
+
+router = fastapi.APIRouter()
+
+# Durée de validité maximale du cache : un échantillon validé après un identifiant plus élevé
+# n'est pas détecté par max(id), il est pris en compte au plus tard à l'expiration
+BATTERY_FORECAST_TTL_SECONDS = 30
+
+# Nombre de fenêtres (window_hours) gardées en cache simultanément
+BATTERY_FORECAST_CACHE_SIZE = 8
+
+# Dernier calcul par fenêtre : (max(id) des échantillons, prévision, date du calcul)
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+# Invalider le cache (ex. après la mise hors service de dispositifs)
+def invalidate_battery_forecast():
+    with _cache_lock:
+        _cache.clear()
+
+
+def compute_battery_forecast(serial_numbers, timestamps, levels):
+    """Calculer en une passe vectorisée la décharge de chaque dispositif.
+
+    Les trois tableaux décrivent un échantillon par position (numéro de série,
+    horodatage en secondes, niveau en %). Seuls les échantillons postérieurs à la
+    dernière recharge de chaque dispositif sont pris en compte ; la pente est
+    obtenue par moindres carrés, groupe par groupe, via np.bincount.
+    """
+    serial_numbers = np.asarray(serial_numbers, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    levels = np.asarray(levels, dtype=np.float64)
+    if serial_numbers.size == 0:
+        return {
+            "serial_numbers": serial_numbers,
+            "battery_level": levels,
+            "last_sampled_at": timestamps,
+            "drain_rate": levels,
+            "hours_to_empty": levels,
+        }
+
+    # Trier par dispositif puis par date, sauf si les échantillons arrivent déjà dans cet ordre
+    same_device = serial_numbers[1:] == serial_numbers[:-1]
+    in_order = (serial_numbers[1:] > serial_numbers[:-1]) | (same_device & (timestamps[1:] >= timestamps[:-1]))
+    if not in_order.all():
+        order = np.lexsort((timestamps, serial_numbers))
+        serial_numbers, timestamps, levels = serial_numbers[order], timestamps[order], levels[order]
+    positions = np.arange(serial_numbers.size)
+
+    # Début de segment : premier échantillon d'un dispositif ou remontée du niveau (recharge)
+    new_device = np.empty(serial_numbers.size, dtype=bool)
+    new_device[0] = True
+    new_device[1:] = serial_numbers[1:] != serial_numbers[:-1]
+    segment_start = new_device.copy()
+    segment_start[1:] |= levels[1:] > levels[:-1]
+    last_segment_start = np.maximum.accumulate(np.where(segment_start, positions, 0))
+
+    device_starts = np.flatnonzero(new_device)
+    device_ends = np.append(device_starts[1:], serial_numbers.size) - 1
+    group = np.cumsum(new_device) - 1
+
+    # Ne garder que le segment courant (depuis la dernière recharge) de chaque dispositif
+    keep = positions >= last_segment_start[device_ends][group]
+    group, hours, kept_levels = group[keep], timestamps[keep] / 3600.0, levels[keep]
+
+    device_count = device_starts.size
+    counts = np.bincount(group, minlength=device_count)
+    mean_hours = np.bincount(group, hours, device_count) / counts
+    mean_levels = np.bincount(group, kept_levels, device_count) / counts
+    centered_hours = hours - mean_hours[group]
+    sxx = np.bincount(group, centered_hours * centered_hours, device_count)
+    sxy = np.bincount(group, centered_hours * (kept_levels - mean_levels[group]), device_count)
+
+    slope = np.full(device_count, np.nan)
+    np.divide(sxy, sxx, out=slope, where=sxx > 0)
+    drain_rate = -slope
+
+    last_levels = levels[device_ends]
+    hours_to_empty = np.full(device_count, np.nan)
+    np.divide(last_levels, drain_rate, out=hours_to_empty, where=drain_rate > 0)
+
+    return {
+        "serial_numbers": serial_numbers[device_starts],
+        "battery_level": last_levels,
+        "last_sampled_at": timestamps[device_ends],
+        "drain_rate": drain_rate,
+        "hours_to_empty": hours_to_empty,
+    }
+
+
+def _load_forecast(db: Session, window_hours: int):
+    latest_sample_id = db.scalar(select(func.max(BatterySample.id)))
+    with _cache_lock:
+        cached = _cache.get(window_hours)
+        if cached is not None:
+            cached_sample_id, forecast, computed_at = cached
+            if cached_sample_id == latest_sample_id and time.monotonic() - computed_at < BATTERY_FORECAST_TTL_SECONDS:
+                _cache.move_to_end(window_hours)
+                return forecast
+
+    # Lecture en colonnes : chaque colonne arrive en un seul bytea au format binaire de Postgres
+    # (int4send / float8send / int2send, gros-boutiste), décodé par np.frombuffer sans objet Python
+    # par échantillon
+    since = datetime.now() - timedelta(hours=window_hours)
+    samples = (
+        select(
+            BatterySample.device_serial_number,
+            cast(func.extract("epoch", BatterySample.sampled_at), Float).label("sampled_at"),
+            BatterySample.battery_level,
+        )
+        .join(Device, Device.serial_number == BatterySample.device_serial_number)
+        .where(BatterySample.sampled_at >= since, Device.deleted == False)
+        .order_by(BatterySample.device_serial_number, BatterySample.sampled_at)
+        .subquery()
+    )
+    empty = literal_column("''::bytea")
+    serial_numbers, timestamps, levels = db.execute(
+        select(
+            func.string_agg(func.int4send(samples.c.device_serial_number), empty),
+            func.string_agg(func.float8send(samples.c.sampled_at), empty),
+            func.string_agg(func.int2send(samples.c.battery_level), empty),
+        )
+    ).one()
+
+    forecast = compute_battery_forecast(
+        np.frombuffer(serial_numbers or b"", dtype=">i4"),
+        np.frombuffer(timestamps or b"", dtype=">f8"),
+        np.frombuffer(levels or b"", dtype=">i2"),
+    )
+    with _cache_lock:
+        _cache[window_hours] = (latest_sample_id, forecast, time.monotonic())
+        _cache.move_to_end(window_hours)
+        while len(_cache) > BATTERY_FORECAST_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return forecast
+
+
+def _optional(value):
+    return None if np.isnan(value) else round(float(value), 2) + 0.0
+
+
+# Tendance de la batterie et projection de la date de décharge pour toute la flotte
+@router.get("/battery/forecast")
+def get_battery_forecast(
+    window_hours: int = Query(72, ge=1, le=24 * 90),
+    limit: int = Query(100, ge=1, le=100000),
+    db: Session = Depends(get_db)
+):
+    forecast = _load_forecast(db, window_hours)
+
+    # Les dispositifs qui se déchargent le plus vite d'abord
+    order = np.argsort(forecast["hours_to_empty"], kind="stable")[:limit]
+
+    result = []
+    for i in order:
+        hours_to_empty = _optional(forecast["hours_to_empty"][i])
+        last_sampled_at = datetime.fromtimestamp(forecast["last_sampled_at"][i], timezone.utc).replace(tzinfo=None)
+        result.append({
+            "serial_number": int(forecast["serial_numbers"][i]),
+            "battery_level": int(forecast["battery_level"][i]),
+            "last_sampled_at": last_sampled_at,
+            "drain_rate_per_hour": _optional(forecast["drain_rate"][i]),
+            "hours_to_empty": hours_to_empty,
+            "projected_empty_at": last_sampled_at + timedelta(hours=hours_to_empty) if hours_to_empty is not None else None
+        })
+
+    return result
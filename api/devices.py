@@ -1,17 +1,116 @@
 import fastapi
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query
+from sqlalchemy import update, select, delete, tuple_, func, and_, or_, any_, bindparam, literal, literal_column, Integer, String
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from db.db_setup import get_db
-from db.models.devices import User, Device, Occupation, Calendar, Position, Alert, Component
-from schemas import DeviceCreateBase, DeviceUpdateBase
+from db.models.devices import User, Device, Occupation, Position, Alert, Component, DeviceStat, Rollout, RolloutDevice
+from db.models.devices import DeviceTypeEnum, OperationalStatusEnum, ConnectionStatusEnum, SoftwareVersionEnum, InitialStateEnum
+from db.purge import wake_purge_worker
+from api.battery import invalidate_battery_forecast
+from schemas import DeviceCreateBase, DeviceUpdateBase, DevicePatchBase, DeviceSyncBase, DeviceSelectionBase, DeviceBulkChangesBase, DeviceBulkUpdateBase
 from datetime import datetime
+import math
+from typing import Optional, List
 
 router = fastapi.APIRouter()
 
+# Champs du dispositif modifiables par PATCH et par la synchronisation d'inventaire
+DEVICE_FIELDS = (
+    "type", "software_version", "image", "initial_state", "mac_address",
+    "operational_status", "connection_status", "battery_level"
+)
+# Nombre de dispositifs par instruction INSERT ... ON CONFLICT
+SYNC_BATCH_SIZE = 1000
+
+
+# Construire les conditions de sélection d'un ensemble de dispositifs
+def _selection_filters(selection: DeviceSelectionBase):
+    filters = []
+    if selection.serial_numbers is not None:
+        filters.append(Device.serial_number.in_(selection.serial_numbers))
+    for field in ("type", "software_version", "initial_state", "operational_status", "connection_status"):
+        value = getattr(selection, field)
+        if value is not None:
+            filters.append(getattr(Device, field) == value)
+    return filters
+
+# Convertir une date avec fuseau en heure locale naïve, comme les dates enregistrées avec datetime.now()
+def _local_datetime(value: Optional[datetime]):
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+# Clôturer l'occupation en cours et ouvrir la suivante si le détenteur change
+def _assign_device(db: Session, serial_number: int, user_id: Optional[int]):
+    now = datetime.now()
+    current_occupation = (
+        db.query(Occupation)
+        .filter(Occupation.device_serial_number == serial_number, Occupation.end_date == None)
+        .first()
+    )
+    if current_occupation and current_occupation.user_id == user_id:
+        return
+
+    if current_occupation:
+        current_occupation.end_date = now
+        db.flush()
+
+    if user_id is not None:
+        db.add(Occupation(user_id=user_id, device_serial_number=serial_number, start_date=now))
+
+# Synchroniser les composants d'un dispositif avec l'ensemble souhaité
+def _sync_components(db: Session, serial_number: int, component_types):
+    desired = list(dict.fromkeys(component_types))
+    existing = set(db.scalars(select(Component.type).where(Component.device_serial_number == serial_number)).all())
+
+    # N'appliquer que la différence : suppressions et insertions groupées
+    to_delete = existing.difference(desired)
+    if to_delete:
+        db.execute(
+            delete(Component)
+            .where(Component.device_serial_number == serial_number, Component.type.in_(to_delete))
+            .execution_options(synchronize_session=False)
+        )
+
+    to_insert = [component_type for component_type in desired if component_type not in existing]
+    if not to_insert:
+        return []
+    return db.execute(
+        insert(Component)
+        .values([{"device_serial_number": serial_number, "type": component_type} for component_type in to_insert])
+        .on_conflict_do_nothing(index_elements=[Component.device_serial_number, Component.type])
+        .returning(Component.id, Component.type)
+    ).all()
+
+# Conflit d'unicité : un dispositif supprimé garde son numéro de série et son adresse MAC jusqu'à la purge
+def _device_conflict(db: Session, serial_numbers, mac_addresses, detail):
+    pending = (
+        db.query(Device.serial_number)
+        .filter(Device.deleted == True,
+                # Un seul paramètre tableau par colonne, quelle que soit la taille du lot
+                or_(Device.serial_number == any_(bindparam("serial_numbers", serial_numbers, type_=ARRAY(Integer))),
+                    Device.mac_address == any_(bindparam("mac_addresses", mac_addresses, type_=ARRAY(String))))
+                )
+        .first()
+    )
+    if pending:
+        detail = f"Device with serial number {pending.serial_number} was deleted and is pending purge, please retry later"
+    return HTTPException(status_code=409, detail=detail)
+
+# Valider la transaction ; une affectation concurrente viole la contrainte d'exclusion
+def _commit_or_conflict(db: Session):
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Conflict with existing data, please retry")
+
 # Récupérer tous les dispositifs
 @router.get("/devices")
 def display_devices(db: Session = Depends(get_db)):
-    devices = db.query(Device).all()
+    devices = db.query(Device).filter(Device.deleted == False).all()
     result = []
 
     for device in devices:
@@ -19,9 +118,8 @@ def display_devices(db: Session = Depends(get_db)):
             db.query(User.first_name, User.last_name)
             .join(Occupation, Occupation.user_id == User.id)
             .filter(Occupation.device_serial_number == device.serial_number,
-                    Occupation.occupied == True
+                    Occupation.end_date == None
                     )
-            .order_by(Occupation.calendar_date.desc())
             .first()
         )
 
@@ -56,6 +154,32 @@ def display_devices(db: Session = Depends(get_db)):
 
     return result
 
+# Statistiques de la flotte, lues depuis les agrégats maintenus par triggers
+@router.get("/devices/stats")
+def get_device_stats(db: Session = Depends(get_db)):
+    counts = {(stat.dimension, stat.value): stat.count for stat in db.query(DeviceStat).all()}
+
+    def by(dimension, enum):
+        return {member.value: counts.get((dimension, member.value), 0) for member in enum}
+
+    total = counts.get(("assignment", "total"), 0)
+    assigned = counts.get(("assignment", "assigned"), 0)
+
+    return {
+        "total": total,
+        "by_type": by("type", DeviceTypeEnum),
+        "by_operational_status": by("operational_status", OperationalStatusEnum),
+        "by_connection_status": by("connection_status", ConnectionStatusEnum),
+        "by_software_version": by("software_version", SoftwareVersionEnum),
+        "by_initial_state": by("initial_state", InitialStateEnum),
+        "battery_histogram": {
+            f"{low}-{low + 9 if low < 90 else 100}": counts.get(("battery_level", str(low)), 0)
+            for low in range(0, 100, 10)
+        },
+        "assigned": assigned,
+        "unassigned": total - assigned
+    }
+
 # Créer un dispositif
 @router.post("/devices")
 def create_device(device_data: DeviceCreateBase, db: Session = Depends(get_db)):
@@ -80,37 +204,32 @@ def create_device(device_data: DeviceCreateBase, db: Session = Depends(get_db)):
     )
 
     db.add(new_device)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise _device_conflict(
+            db, [device_data.serial_number], [device_data.mac_address],
+            "Device with this serial number or MAC address already exists"
+        )
     db.refresh(new_device)
 
     # Ajouter les composants associés au dispositif
     components = []
     if device_data.components:
-        for component in device_data.components:
-            new_component = Component(
-                device_serial_number=device_data.serial_number,
-                type=component.type
-            )
-            db.add(new_component)
-            components.append(new_component)
+        components = _sync_components(db, device_data.serial_number, [component.type for component in device_data.components])
 
     db.commit()
 
     # Vérifier si un utilisateur est assigné
     if device_data.user_id is not None:
-        # Ajouter une entrée dans `calendar`
-        calendar_entry = Calendar(date=datetime.now())
-        db.add(calendar_entry)
-        db.commit()
-        db.refresh(calendar_entry)
-
         new_occupation = Occupation(
             user_id=device_data.user_id,
             device_serial_number=device_data.serial_number,  
-            calendar_date=calendar_entry.date
+            start_date=datetime.now()
         )
         db.add(new_occupation)
-        db.commit()
+        _commit_or_conflict(db)
 
     return {
         "message": "Device created successfully",
@@ -133,7 +252,7 @@ def create_device(device_data: DeviceCreateBase, db: Session = Depends(get_db)):
 # Récupérer les détails d'un dispositif spécifique
 @router.get("/devices/{serial_number}")
 def get_device_details(serial_number: int, db: Session = Depends(get_db)): 
-    device = db.query(Device).filter(Device.serial_number == serial_number).first()
+    device = db.query(Device).filter(Device.serial_number == serial_number, Device.deleted == False).first()
     
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
@@ -142,9 +261,8 @@ def get_device_details(serial_number: int, db: Session = Depends(get_db)):
         db.query(User.first_name, User.last_name)
         .join(Occupation, Occupation.user_id == User.id)
         .filter(Occupation.device_serial_number == serial_number,
-                Occupation.occupied == True
+                Occupation.end_date == None
                 )  
-        .order_by(Occupation.calendar_date.desc())
         .first()
     )
 
@@ -177,24 +295,67 @@ def get_device_details(serial_number: int, db: Session = Depends(get_db)):
         "components": [{"id": comp.id, "device_serial_number": comp.device_serial_number, "type": comp.type} for comp in components]
     }
 
-# Modifier les informations d'un dispositif spécifique
-@router.put("/devices/{serial_number}")
-def update_device(serial_number: str, device_data: DeviceUpdateBase, db: Session = Depends(get_db)):
-    # Vérifier la dernière occupation AVANT de lever une exception
-    last_occupation = (
-        db.query(Occupation)
-        .filter(Occupation.device_serial_number == serial_number)
-        .order_by(Occupation.calendar_date.desc())
-        .first()
-    )
+# Synchroniser l'inventaire : insertion ou mise à jour groupée, sans écriture pour les dispositifs inchangés
+@router.put("/devices/sync")
+def sync_devices(devices_data: List[DeviceSyncBase], db: Session = Depends(get_db)):
+    # Un même numéro de série ne peut apparaître qu'une fois par instruction : garder le dernier
+    rows = list({device_data.serial_number: device_data.model_dump() for device_data in devices_data}.values())
+    columns = DEVICE_FIELDS + ("creation_date",)
+
+    inserted = updated = 0
+    pending_purge = []
+    # Une transaction par lot : les verrous (lignes et compteurs d'agrégats) sont libérés à chaque lot
+    for start in range(0, len(rows), SYNC_BATCH_SIZE):
+        batch = rows[start:start + SYNC_BATCH_SIZE]
+        try:
+            # Dispositifs supprimés en attente de purge : ignorés par l'upsert, signalés à part
+            batch_pending_purge = db.scalars(
+                select(Device.serial_number)
+                .where(Device.deleted == True, Device.serial_number.in_([row["serial_number"] for row in batch]))
+            ).all()
+
+            stmt = insert(Device).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Device.serial_number],
+                set_={column: stmt.excluded[column] for column in columns},
+                # Ne réécrire que les lignes qui diffèrent ; les dispositifs supprimés ne sont pas ressuscités
+                where=and_(
+                    Device.deleted == False,
+                    or_(*(getattr(Device, column).is_distinct_from(stmt.excluded[column]) for column in columns))
+                )
+            ).returning(Device.serial_number, (literal_column("xmax") == 0).label("inserted"))
+
+            batch_results = db.execute(stmt).all()
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            # Les lots précédents sont validés ; la synchronisation est idempotente et peut être relancée
+            raise _device_conflict(
+                db, [row["serial_number"] for row in batch], [row["mac_address"] for row in batch],
+                f"Conflict with existing data in the batch starting at device {start}, "
+                f"{start} devices were already synchronized"
+            )
 
-    # Si user_id est None, mettre à jour `occupied = False`
-    if device_data.user_id is None and last_occupation:
-        last_occupation.occupied = False
-        db.commit()
+        pending_purge += batch_pending_purge
+        for row in batch_results:
+            if row.inserted:
+                inserted += 1
+            else:
+                updated += 1
 
+    return {
+        "message": "Devices synchronized successfully",
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(rows) - inserted - updated - len(pending_purge),
+        "pending_purge": pending_purge
+    }
+
+# Modifier les informations d'un dispositif spécifique
+@router.put("/devices/{serial_number}")
+def update_device(serial_number: int, device_data: DeviceUpdateBase, db: Session = Depends(get_db)):
     # Vérifier si le device existe
-    device = db.query(Device).filter(Device.serial_number == serial_number).first()
+    device = db.query(Device).filter(Device.serial_number == serial_number, Device.deleted == False).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
@@ -214,32 +375,14 @@ def update_device(serial_number: str, device_data: DeviceUpdateBase, db: Session
     device.connection_status = device_data.connection_status
     device.battery_level = device_data.battery_level
 
-    # Ajouter tous les composants fournis
-    for component_data in device_data.components:
-        new_component = Component(
-            device_serial_number=serial_number,
-            type=component_data.type
-        )
-        db.add(new_component)  # Ajout direct sans vérification
-
-    # Si l'utilisateur a changé, ajouter une nouvelle occupation
-    if device_data.user_id is not None and (not last_occupation or last_occupation.user_id != device_data.user_id):
-        # Créer une nouvelle entrée dans le calendrier
-        new_calendar_entry = Calendar(date=datetime.now())
-        db.add(new_calendar_entry)
-        db.commit()
-        db.refresh(new_calendar_entry)
+    # Synchroniser les composants fournis (seules les différences sont écrites)
+    if device_data.components is not None:
+        _sync_components(db, serial_number, [component.type for component in device_data.components])
 
-        # Ajouter une nouvelle occupation
-        new_occupation = Occupation(
-            user_id=device_data.user_id,
-            device_serial_number=serial_number,
-            calendar_date=new_calendar_entry.date,
-            occupied=True
-        )
-        db.add(new_occupation)
+    # Mettre à jour le détenteur du dispositif (user_id None : libérer le dispositif)
+    _assign_device(db, serial_number, device_data.user_id)
 
-    db.commit()
+    _commit_or_conflict(db)
     db.refresh(device)
 
     return {
@@ -258,70 +401,298 @@ def update_device(serial_number: str, device_data: DeviceUpdateBase, db: Session
         }
     }
 
+# Modifier partiellement un dispositif : seuls les champs fournis et différents sont écrits
+@router.patch("/devices/{serial_number}")
+def patch_device(serial_number: int, device_data: DevicePatchBase, db: Session = Depends(get_db)):
+    device = db.query(Device).filter(Device.serial_number == serial_number, Device.deleted == False).first()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+
+    data = device_data.model_dump(exclude_unset=True)
+
+    # Vérifier si un user_id est fourni et qu'il existe
+    if data.get("user_id") is not None:
+        new_user = db.query(User).filter(User.id == data["user_id"]).first()
+        if not new_user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+    updated_fields = [
+        field for field in DEVICE_FIELDS
+        if data.get(field) is not None and getattr(device, field) != data[field]
+    ]
+    for field in updated_fields:
+        setattr(device, field, data[field])
+
+    if data.get("components") is not None:
+        _sync_components(db, serial_number, [component["type"] for component in data["components"]])
+
+    if "user_id" in data:
+        _assign_device(db, serial_number, data["user_id"])
+
+    _commit_or_conflict(db)
+
+    return {
+        "message": "Device updated successfully",
+        "updated_fields": updated_fields,
+        "device": {
+            "serial_number": device.serial_number,
+            "type": device.type,
+            "software_version": device.software_version,
+            "initial_state": device.initial_state,
+            "image": device.image,
+            "mac_address": device.mac_address,
+            "operational_status": device.operational_status,
+            "connection_status": device.connection_status,
+            "battery_level": device.battery_level
+        }
+    }
+
+# Mettre hors service un ensemble de dispositifs (liste ou filtre)
+@router.post("/devices/decommission")
+def decommission_devices(selection: DeviceSelectionBase, db: Session = Depends(get_db)):
+    filters = _selection_filters(selection)
+    if not filters:
+        raise HTTPException(status_code=400, detail="At least one selection criterion is required")
+
+    serial_numbers = db.scalars(
+        update(Device)
+        .where(Device.deleted == False, *filters)
+        .values(deleted=True, deleted_at=datetime.now())
+        .returning(Device.serial_number)
+    ).all()
+
+    # Libérer les dispositifs encore occupés
+    if serial_numbers:
+        db.query(Occupation).filter(
+            Occupation.device_serial_number.in_(serial_numbers),
+            Occupation.end_date == None
+        ).update({Occupation.end_date: datetime.now()}, synchronize_session=False)
+    db.commit()
+
+    # L'historique est purgé par lots en arrière-plan
+    wake_purge_worker()
+    invalidate_battery_forecast()
+
+    return {
+        "message": f"{len(serial_numbers)} devices have been decommissioned",
+        "serial_numbers": serial_numbers
+    }
+
+# Mettre à jour un ensemble de dispositifs en une seule requête, éventuellement par vagues
+@router.patch("/devices")
+def bulk_update_devices(bulk_data: DeviceBulkUpdateBase, db: Session = Depends(get_db)):
+    if bulk_data.rollout_id is not None:
+        # Vague suivante : l'ensemble cible et les modifications sont ceux du déploiement
+        if bulk_data.selection is not None or bulk_data.changes is not None:
+            raise HTTPException(status_code=400, detail="selection and changes are fixed by the rollout")
+        rollout = db.get(Rollout, bulk_data.rollout_id)
+        if not rollout:
+            raise HTTPException(status_code=404, detail="Rollout not found")
+        changes = DeviceBulkChangesBase(**rollout.changes).model_dump(exclude_none=True)
+    else:
+        if bulk_data.selection is None or bulk_data.changes is None:
+            raise HTTPException(status_code=400, detail="selection and changes are required to start a rollout")
+        filters = _selection_filters(bulk_data.selection)
+        if not filters:
+            raise HTTPException(status_code=400, detail="At least one selection criterion is required")
+
+        changes = bulk_data.changes.model_dump(exclude_none=True)
+        if not changes:
+            raise HTTPException(status_code=400, detail="No changes provided")
+
+        # Figer l'ensemble cible : les vagues et l'avancement portent toujours sur ces dispositifs
+        rollout = Rollout(changes=bulk_data.changes.model_dump(mode="json", exclude_none=True))
+        db.add(rollout)
+        db.flush()
+        db.execute(
+            insert(RolloutDevice).from_select(
+                ["rollout_id", "device_serial_number"],
+                select(literal(rollout.id), Device.serial_number).where(Device.deleted == False, *filters)
+            )
+        )
+
+    rollout_id = rollout.id
+    targeted = and_(
+        Device.deleted == False,
+        Device.serial_number.in_(
+            select(RolloutDevice.device_serial_number).where(RolloutDevice.rollout_id == rollout_id)
+        )
+    )
+    # Dispositifs cibles qui n'ont pas encore reçu les nouvelles valeurs
+    pending = and_(targeted, or_(*(getattr(Device, field).is_distinct_from(value) for field, value in changes.items())))
+    applied = and_(*(getattr(Device, field) == value for field, value in changes.items()))
+
+    total, updated, remaining = db.execute(
+        select(func.count(), func.count().filter(applied), func.count().filter(pending)).where(targeted)
+    ).one()
+
+    # Taille de la vague : pourcentage cumulé de l'ensemble cible et/ou nombre maximal de dispositifs
+    wave_size = bulk_data.batch_size
+    if bulk_data.percentage is not None:
+        wave_size = max(math.ceil(total * bulk_data.percentage / 100) - updated, 0)
+        if bulk_data.batch_size is not None:
+            wave_size = min(wave_size, bulk_data.batch_size)
+
+    serial_numbers = []
+    if wave_size != 0:
+        if wave_size is not None:
+            wave = (
+                select(Device.serial_number)
+                .where(pending)
+                .order_by(Device.serial_number)
+                .limit(wave_size)
+                .with_for_update(skip_locked=True)
+            )
+            target = Device.serial_number.in_(wave)
+        else:
+            target = pending
+
+        serial_numbers = db.scalars(
+            update(Device)
+            .where(target)
+            .values(**changes)
+            .returning(Device.serial_number)
+            .execution_options(synchronize_session=False)
+        ).all()
+    db.commit()
+
+    updated += len(serial_numbers)
+    remaining -= len(serial_numbers)
+    return {
+        "message": f"{len(serial_numbers)} devices updated",
+        "rollout_id": rollout_id,
+        "serial_numbers": serial_numbers,
+        "progress": {
+            "total": total,
+            "updated": updated,
+            "remaining": remaining,
+            "percentage": round(updated * 100 / total, 2) if total else 100.0
+        }
+    }
+
 # Supprimer un dispositif
 @router.delete("/devices/{serial_number}")
 def delete_device(serial_number: int, db: Session = Depends(get_db)):
-    device = db.query(Device).filter(Device.serial_number == serial_number).first()
+    device = db.query(Device).filter(Device.serial_number == serial_number, Device.deleted == False).first()
     
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
-    # Supprimer les enregistrements dans les tables dépendantes
-    db.query(Occupation).filter(Occupation.device_serial_number == serial_number).delete()
-    db.query(Position).filter(Position.device_serial_number == serial_number).delete()
-    db.query(Component).filter(Component.device_serial_number == serial_number).delete()
-    db.query(Alert).filter(Alert.device_serial_number == serial_number).delete()
-
-    # Supprimer le dispositif
-    db.delete(device)
+    # Suppression logique : les tables dépendantes sont purgées en arrière-plan
+    device.deleted = True
+    device.deleted_at = datetime.now()
+    db.query(Occupation).filter(
+        Occupation.device_serial_number == serial_number,
+        Occupation.end_date == None
+    ).update({Occupation.end_date: datetime.now()}, synchronize_session=False)
     db.commit()
+
+    wake_purge_worker()
+    invalidate_battery_forecast()
     
-    return {"message": f"Device with serial number {serial_number} and its dependencies have been deleted successfully"}
+    return {"message": f"Device with serial number {serial_number} has been deleted, its dependencies will be purged in the background"}
 
 
-# Récupérer toutes les occupations d'un dispositif spécifique
+# Récupérer les occupations d'un dispositif spécifique, paginées par clé (start_date, id)
 @router.get("/devices/{serial_number}/occupations")
-def get_device_occupations(serial_number: int, db: Session = Depends(get_db)):
+def get_device_occupations(
+    serial_number: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    before_start_date: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
     # Vérifier si le device existe
-    device = db.query(Device).filter(Device.serial_number == serial_number).first()
+    device = db.query(Device).filter(Device.serial_number == serial_number, Device.deleted == False).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
+    if (before_start_date is None) != (before_id is None):
+        raise HTTPException(status_code=400, detail="before_start_date and before_id must be provided together")
+    start, end, before_start_date = _local_datetime(start), _local_datetime(end), _local_datetime(before_start_date)
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must be before or equal to end")
+
     # Récupérer les occupations du device
-    occupations = (
+    query = (
         db.query(Occupation, User.first_name, User.last_name, User.email)
         .join(User, Occupation.user_id == User.id)
-        .filter(Occupation.device_serial_number == serial_number)  # Correction ici
-        .order_by(Occupation.calendar_date.desc())
-        .all()
+        .filter(Occupation.device_serial_number == serial_number)
     )
 
+    # Occupations qui chevauchent l'intervalle [start, end)
+    if start is not None or end is not None:
+        query = query.filter(Occupation.period().op("&&")(func.tsrange(start, end)))
+
+    # Reprendre après la dernière occupation de la page précédente
+    if before_start_date is not None:
+        query = query.filter(tuple_(Occupation.start_date, Occupation.id) < tuple_(before_start_date, before_id))
+
+    occupations = query.order_by(Occupation.start_date.desc(), Occupation.id.desc()).limit(limit).all()
+
     # Construire la liste des occupations
     occupation_list = [
         {
+            "id": occupation.Occupation.id,
             "user_id": occupation.Occupation.user_id,
             "first_name": occupation.first_name,
             "last_name": occupation.last_name,
             "email": occupation.email,
-            "calendar_date": occupation.Occupation.calendar_date
+            "start_date": occupation.Occupation.start_date,
+            "end_date": occupation.Occupation.end_date
         }
         for occupation in occupations
     ]
 
     return occupation_list
 
+# Récupérer le détenteur d'un dispositif à un instant donné
+@router.get("/devices/{serial_number}/holder")
+def get_device_holder(serial_number: int, at: Optional[datetime] = None, db: Session = Depends(get_db)):
+    device = db.query(Device).filter(Device.serial_number == serial_number, Device.deleted == False).first()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+
+    at = _local_datetime(at) or datetime.now()
+    holder = (
+        db.query(Occupation, User.first_name, User.last_name, User.email)
+        .join(User, Occupation.user_id == User.id)
+        .filter(Occupation.device_serial_number == serial_number,
+                Occupation.period().op("@>")(at)
+                )
+        .first()
+    )
+
+    return {
+        "serial_number": serial_number,
+        "at": at,
+        "user_id": holder.Occupation.user_id if holder else None,
+        "first_name": holder.first_name if holder else None,
+        "last_name": holder.last_name if holder else None,
+        "email": holder.email if holder else None,
+        "start_date": holder.Occupation.start_date if holder else None,
+        "end_date": holder.Occupation.end_date if holder else None
+    }
+
 
 # Récupérer toutes les alertes d'un dispositif spécifique
 @router.get("/devices/{serial_number}/alerts")
 def get_device_alerts(serial_number: int, db: Session = Depends(get_db)):
-    alerts = db.query(Alert).filter(Alert.device_serial_number == serial_number).all()
+    alerts = (
+        db.query(Alert)
+        .join(Device, Alert.device_serial_number == Device.serial_number)
+        .filter(Alert.device_serial_number == serial_number, Device.deleted == False)
+        .all()
+    )
     
     return [{"id": alert.id, "message": alert.message, "date": alert.date} for alert in alerts]
 
 # Récupérer les composants d'un dispositif spécifique
 @router.get("/devices/{serial_number}/components")
 def get_device_components(serial_number: int, db: Session = Depends(get_db)):
-    device = db.query(Device).filter(Device.serial_number == serial_number).first()
+    device = db.query(Device).filter(Device.serial_number == serial_number, Device.deleted == False).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
@@ -329,8 +700,3 @@ def get_device_components(serial_number: int, db: Session = Depends(get_db)):
 
     return [{"id": comp.id, "device_serial_number": comp.device_serial_number, "type": comp.type} for comp in components]
 
-# Récupérer tous les utilisateurs
-@router.get("/users")
-def get_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
-
@@ -0,0 +1,95 @@
+import fastapi
+from fastapi import Depends, HTTPException, Query
+from sqlalchemy import and_, or_, func, cast, Float
+from sqlalchemy.orm import Session
+from db.db_setup import get_db
+from db.models.devices import User, Device, Occupation
+from typing import Optional, Literal
+
+router = fastapi.APIRouter()
+
+# Récupérer les utilisateurs, paginés par id, avec recherche optionnelle sur le nom et l'email
+@router.get("/users")
+def get_users(
+    q: Optional[str] = None,
+    mode: Literal["prefix", "fuzzy"] = "prefix",
+    after_id: Optional[int] = None,
+    before_score: Optional[float] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    query = db.query(User.id, User.first_name, User.last_name, User.email)
+    name = User.search_name()
+    email = func.lower(User.email)
+
+    if q and mode == "fuzzy":
+        # Meilleures correspondances d'abord (index trigrammes), paginées par clé (score, id)
+        if (before_score is None) != (after_id is None):
+            raise HTTPException(status_code=400, detail="before_score and after_id must be provided together")
+
+        term = q.lower()
+        # Score en double précision des deux côtés : la valeur renvoyée au client revient à l'identique
+        # dans le curseur, sinon les ex aequo du score de fin de page seraient sautés
+        score = cast(func.greatest(func.word_similarity(term, name), func.similarity(email, term)), Float)
+        query = query.add_columns(score.label("score")).filter(name.op("%>")(term) | email.op("%")(term))
+        if before_score is not None:
+            cursor_score = cast(before_score, Float)
+            query = query.filter(or_(score < cursor_score, and_(score == cursor_score, User.id > after_id)))
+        users = query.order_by(score.desc(), User.id).limit(limit).all()
+
+        return [
+            {"id": user.id, "first_name": user.first_name, "last_name": user.last_name, "email": user.email,
+             "score": user.score}
+            for user in users
+        ]
+
+    if before_score is not None:
+        raise HTTPException(status_code=400, detail="before_score is only supported in fuzzy mode")
+    if q:
+        term = q.lower()
+        query = query.filter(name.startswith(term, autoescape=True) | email.startswith(term, autoescape=True))
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+    users = query.order_by(User.id).limit(limit).all()
+
+    return [
+        {"id": user.id, "first_name": user.first_name, "last_name": user.last_name, "email": user.email}
+        for user in users
+    ]
+
+# Récupérer les dispositifs actuels et passés d'un utilisateur
+@router.get("/users/{user_id}/devices")
+def get_user_devices(user_id: int, db: Session = Depends(get_db)):
+    # Une seule requête : l'utilisateur, ses occupations et les dispositifs associés
+    rows = (
+        db.query(User.id, Occupation.start_date, Occupation.end_date, Device)
+        .outerjoin(Occupation, Occupation.user_id == User.id)
+        .outerjoin(Device, and_(Device.serial_number == Occupation.device_serial_number, Device.deleted == False))
+        .filter(User.id == user_id)
+        .order_by(Occupation.start_date.desc())
+        .all()
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    current_devices = []
+    past_devices = []
+    for row in rows:
+        if row.Device is None:
+            continue
+        assignment = {
+            "serial_number": row.Device.serial_number,
+            "type": row.Device.type.value,
+            "software_version": row.Device.software_version,
+            "operational_status": row.Device.operational_status.value,
+            "connection_status": row.Device.connection_status.value,
+            "battery_level": row.Device.battery_level,
+            "start_date": row.start_date,
+            "end_date": row.end_date
+        }
+        if row.end_date is None:
+            current_devices.append(assignment)
+        else:
+            past_devices.append(assignment)
+
+    return {"user_id": user_id, "current_devices": current_devices, "past_devices": past_devices}
@@ -0,0 +1,12 @@
+-- Suppression logique des dispositifs et index pour la purge en arrière-plan
+
+ALTER TABLE device ADD COLUMN IF NOT EXISTS deleted BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE device ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP NULL;
+
+-- Seuls les dispositifs en attente de purge sont indexés
+CREATE INDEX IF NOT EXISTS ix_device_pending_purge ON device (serial_number) WHERE deleted;
+
+-- Index sur les clés étrangères : la purge supprime l'historique par lots
+CREATE INDEX IF NOT EXISTS ix_position_device_serial_number ON position (device_serial_number);
+CREATE INDEX IF NOT EXISTS ix_alert_device_serial_number ON alert (device_serial_number);
+CREATE INDEX IF NOT EXISTS ix_component_device_serial_number ON component (device_serial_number);
@@ -0,0 +1,159 @@
+-- Agrégats de la flotte maintenus de façon incrémentale par triggers
+
+CREATE TABLE IF NOT EXISTS device_stats (
+    dimension VARCHAR NOT NULL,
+    value VARCHAR NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, value)
+);
+
+-- Clés d'agrégat d'un dispositif (aucune pour un dispositif supprimé)
+CREATE OR REPLACE FUNCTION device_stats_keys(
+    d_type TEXT, d_operational_status TEXT, d_connection_status TEXT, d_software_version TEXT,
+    d_initial_state TEXT, d_battery_level INTEGER, d_deleted BOOLEAN
+) RETURNS TABLE (dimension TEXT, value TEXT) AS $$
+    SELECT k.dimension, k.value
+    FROM (VALUES
+        ('type', d_type),
+        ('operational_status', d_operational_status),
+        ('connection_status', d_connection_status),
+        ('software_version', d_software_version),
+        ('initial_state', d_initial_state),
+        ('battery_level', (LEAST(GREATEST(d_battery_level, 0) / 10, 9) * 10)::text),
+        ('assignment', 'total')
+    ) AS k (dimension, value)
+    WHERE d_deleted IS FALSE;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Un déclenchement par instruction : les variations de toutes les lignes modifiées sont
+-- agrégées, puis appliquées en un seul upsert trié par (dimension, value). Seuls les compteurs
+-- dont la variation nette est non nulle sont verrouillés, toujours dans le même ordre.
+CREATE OR REPLACE FUNCTION device_stats_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO device_stats (dimension, value, count)
+        SELECT k.dimension, k.value, COUNT(*)
+        FROM new_rows n
+        CROSS JOIN LATERAL device_stats_keys(
+            n.type::text, n.operational_status::text, n.connection_status::text, n.software_version::text,
+            n.initial_state::text, n.battery_level, n.deleted
+        ) k
+        GROUP BY k.dimension, k.value
+        ORDER BY k.dimension, k.value
+        ON CONFLICT (dimension, value) DO UPDATE SET count = device_stats.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO device_stats (dimension, value, count)
+        SELECT k.dimension, k.value, -COUNT(*)
+        FROM old_rows o
+        CROSS JOIN LATERAL device_stats_keys(
+            o.type::text, o.operational_status::text, o.connection_status::text, o.software_version::text,
+            o.initial_state::text, o.battery_level, o.deleted
+        ) k
+        GROUP BY k.dimension, k.value
+        ORDER BY k.dimension, k.value
+        ON CONFLICT (dimension, value) DO UPDATE SET count = device_stats.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO device_stats (dimension, value, count)
+        SELECT d.dimension, d.value, SUM(d.delta)
+        FROM (
+            SELECT k.dimension, k.value, -1 AS delta
+            FROM old_rows o
+            CROSS JOIN LATERAL device_stats_keys(
+                o.type::text, o.operational_status::text, o.connection_status::text, o.software_version::text,
+                o.initial_state::text, o.battery_level, o.deleted
+            ) k
+            UNION ALL
+            SELECT k.dimension, k.value, 1 AS delta
+            FROM new_rows n
+            CROSS JOIN LATERAL device_stats_keys(
+                n.type::text, n.operational_status::text, n.connection_status::text, n.software_version::text,
+                n.initial_state::text, n.battery_level, n.deleted
+            ) k
+        ) d
+        GROUP BY d.dimension, d.value
+        HAVING SUM(d.delta) <> 0
+        ORDER BY d.dimension, d.value
+        ON CONFLICT (dimension, value) DO UPDATE SET count = device_stats.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Les tables de transition imposent un trigger par événement
+DROP TRIGGER IF EXISTS device_stats_sync ON device;
+DROP TRIGGER IF EXISTS device_stats_insert ON device;
+CREATE TRIGGER device_stats_insert
+    AFTER INSERT ON device
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION device_stats_trigger();
+
+DROP TRIGGER IF EXISTS device_stats_update ON device;
+CREATE TRIGGER device_stats_update
+    AFTER UPDATE ON device
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION device_stats_trigger();
+
+DROP TRIGGER IF EXISTS device_stats_delete ON device;
+CREATE TRIGGER device_stats_delete
+    AFTER DELETE ON device
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION device_stats_trigger();
+
+-- Nombre de dispositifs assignés : une occupation en cours par dispositif
+CREATE OR REPLACE FUNCTION occupation_stats_trigger() RETURNS trigger AS $$
+DECLARE
+    delta INTEGER := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.occupied THEN
+        delta := delta - 1;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.occupied THEN
+        delta := delta + 1;
+    END IF;
+    IF delta <> 0 THEN
+        INSERT INTO device_stats (dimension, value, count) VALUES ('assignment', 'assigned', delta)
+        ON CONFLICT (dimension, value) DO UPDATE SET count = device_stats.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS occupation_stats_sync ON occupation;
+CREATE TRIGGER occupation_stats_sync
+    AFTER INSERT OR UPDATE OR DELETE ON occupation
+    FOR EACH ROW EXECUTE FUNCTION occupation_stats_trigger();
+
+-- Initialisation à partir des données existantes
+BEGIN;
+LOCK TABLE device, occupation IN SHARE ROW EXCLUSIVE MODE;
+
+-- Seule la dernière occupation d'un dispositif peut être en cours
+UPDATE occupation o SET occupied = FALSE
+WHERE o.occupied AND EXISTS (
+    SELECT 1 FROM occupation newer
+    WHERE newer.device_serial_number = o.device_serial_number
+      AND newer.calendar_date > o.calendar_date
+);
+UPDATE occupation o SET occupied = FALSE
+FROM device d
+WHERE o.occupied AND d.serial_number::text = o.device_serial_number AND d.deleted;
+
+TRUNCATE device_stats;
+INSERT INTO device_stats (dimension, value, count)
+SELECT dimension, value, COUNT(*)
+FROM device d
+CROSS JOIN LATERAL (VALUES
+    ('type', d.type::text),
+    ('operational_status', d.operational_status::text),
+    ('connection_status', d.connection_status::text),
+    ('software_version', d.software_version::text),
+    ('initial_state', d.initial_state::text),
+    ('battery_level', (LEAST(GREATEST(d.battery_level, 0) / 10, 9) * 10)::text),
+    ('assignment', 'total')
+) AS s (dimension, value)
+WHERE NOT d.deleted
+GROUP BY dimension, value;
+
+INSERT INTO device_stats (dimension, value, count)
+SELECT 'assignment', 'assigned', COUNT(*) FROM occupation WHERE occupied;
+COMMIT;
@@ -0,0 +1,60 @@
+-- Occupations stockées comme intervalles [start_date, end_date) au lieu d'événements ponctuels
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+BEGIN;
+
+ALTER TABLE occupation DROP CONSTRAINT IF EXISTS occupation_pkey;
+ALTER TABLE occupation DROP CONSTRAINT IF EXISTS occupation_calendar_date_fkey;
+ALTER TABLE occupation DROP CONSTRAINT IF EXISTS occupation_device_serial_number_fkey;
+
+ALTER TABLE occupation ADD COLUMN id SERIAL PRIMARY KEY;
+ALTER TABLE occupation ALTER COLUMN device_serial_number TYPE INTEGER USING device_serial_number::integer;
+ALTER TABLE occupation ADD CONSTRAINT occupation_device_serial_number_fkey
+    FOREIGN KEY (device_serial_number) REFERENCES device (serial_number);
+ALTER TABLE occupation RENAME COLUMN calendar_date TO start_date;
+ALTER TABLE occupation ADD COLUMN end_date TIMESTAMP NULL;
+
+-- Une occupation se termine au début de la suivante ; la dernière reste ouverte si elle est en cours.
+-- La date de fin d'une dernière occupation déjà libérée est inconnue : l'intervalle est vide.
+UPDATE occupation o
+SET end_date = CASE
+    WHEN n.next_start IS NOT NULL THEN n.next_start
+    WHEN o.occupied THEN NULL
+    ELSE o.start_date
+END
+FROM (
+    SELECT id, LEAD(start_date) OVER (PARTITION BY device_serial_number ORDER BY start_date, id) AS next_start
+    FROM occupation
+) n
+WHERE n.id = o.id;
+
+-- Le nombre de dispositifs assignés suit désormais les intervalles ouverts
+CREATE OR REPLACE FUNCTION occupation_stats_trigger() RETURNS trigger AS $$
+DECLARE
+    delta INTEGER := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.end_date IS NULL THEN
+        delta := delta - 1;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.end_date IS NULL THEN
+        delta := delta + 1;
+    END IF;
+    IF delta <> 0 THEN
+        INSERT INTO device_stats (dimension, value, count) VALUES ('assignment', 'assigned', delta)
+        ON CONFLICT (dimension, value) DO UPDATE SET count = device_stats.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE occupation DROP COLUMN occupied;
+DROP TABLE IF EXISTS calendar;
+
+-- Un seul détenteur à la fois par dispositif ; sert aussi d'index GiST pour les requêtes d'intervalle
+ALTER TABLE occupation ADD CONSTRAINT occupation_no_overlap
+    EXCLUDE USING gist (device_serial_number WITH =, tsrange(start_date, end_date) WITH &&);
+
+CREATE INDEX ix_occupation_device_start ON occupation (device_serial_number, start_date DESC, id DESC);
+
+COMMIT;
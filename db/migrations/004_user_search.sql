@@ -0,0 +1,10 @@
+-- Recherche d'utilisateurs par trigrammes et accès inverse utilisateur -> dispositifs
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_users_name_trgm
+    ON users USING gin (lower(first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_users_email_trgm
+    ON users USING gin (lower(email) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS ix_occupation_user_start ON occupation (user_id, start_date DESC);
@@ -0,0 +1,34 @@
+-- Historique compact du niveau de batterie, alimenté par trigger à chaque changement
+
+CREATE TABLE IF NOT EXISTS battery_sample (
+    id BIGSERIAL PRIMARY KEY,
+    device_serial_number INTEGER NOT NULL REFERENCES device (serial_number),
+    sampled_at TIMESTAMP NOT NULL,
+    battery_level SMALLINT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_battery_sample_device_time ON battery_sample (device_serial_number, sampled_at);
+CREATE INDEX IF NOT EXISTS ix_battery_sample_sampled_at ON battery_sample USING brin (sampled_at);
+
+CREATE OR REPLACE FUNCTION battery_sample_trigger() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO battery_sample (device_serial_number, sampled_at, battery_level)
+    VALUES (NEW.serial_number, LOCALTIMESTAMP, NEW.battery_level);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS battery_sample_insert ON device;
+CREATE TRIGGER battery_sample_insert
+    AFTER INSERT ON device
+    FOR EACH ROW EXECUTE FUNCTION battery_sample_trigger();
+
+DROP TRIGGER IF EXISTS battery_sample_update ON device;
+CREATE TRIGGER battery_sample_update
+    AFTER UPDATE OF battery_level ON device
+    FOR EACH ROW WHEN (OLD.battery_level IS DISTINCT FROM NEW.battery_level)
+    EXECUTE FUNCTION battery_sample_trigger();
+
+-- Premier échantillon : niveau actuel des dispositifs existants
+INSERT INTO battery_sample (device_serial_number, sampled_at, battery_level)
+SELECT serial_number, LOCALTIMESTAMP, battery_level FROM device WHERE NOT deleted;
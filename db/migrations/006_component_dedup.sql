@@ -0,0 +1,15 @@
+-- Dédoublonnage des composants ajoutés à chaque mise à jour, puis unicité (dispositif, type)
+
+BEGIN;
+LOCK TABLE component IN SHARE ROW EXCLUSIVE MODE;
+
+-- Conserver le plus ancien composant de chaque type par dispositif
+DELETE FROM component c
+USING component kept
+WHERE kept.device_serial_number = c.device_serial_number
+  AND kept.type = c.type
+  AND kept.id < c.id;
+
+ALTER TABLE component ADD CONSTRAINT uq_component_device_type UNIQUE (device_serial_number, type);
+
+COMMIT;
@@ -0,0 +1,15 @@
+-- Déploiements par vagues : l'ensemble cible est figé à la première vague
+
+CREATE TABLE IF NOT EXISTS rollout (
+    id SERIAL PRIMARY KEY,
+    changes JSON NOT NULL,
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS rollout_device (
+    rollout_id INTEGER NOT NULL REFERENCES rollout (id),
+    device_serial_number INTEGER NOT NULL REFERENCES device (serial_number),
+    PRIMARY KEY (rollout_id, device_serial_number)
+);
+
+CREATE INDEX IF NOT EXISTS ix_rollout_device_device_serial_number ON rollout_device (device_serial_number);
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, ForeignKey, Integer, Boolean, String, Float, DateTime, Enum, Date
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, SmallInteger, Boolean, String, Float, DateTime, Enum, Date, JSON, Index, UniqueConstraint, func, literal_column
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import relationship
 from ..db_setup import Base
 from datetime import datetime, date
@@ -42,6 +43,26 @@ class User(Base):
     password = Column(String, nullable=False)
     devices = relationship("Occupation", back_populates="user")
 
+    # Nom complet en minuscules, tel qu'indexé pour la recherche par trigrammes
+    @classmethod
+    def search_name(cls):
+        return func.lower(cls.first_name + literal_column("' '") + cls.last_name)
+
+    __table_args__ = (
+        Index(
+            "ix_users_name_trgm",
+            func.lower(first_name + literal_column("' '") + last_name).label("search_name"),
+            postgresql_using="gin",
+            postgresql_ops={"search_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_users_email_trgm",
+            func.lower(email).label("search_email"),
+            postgresql_using="gin",
+            postgresql_ops={"search_email": "gin_trgm_ops"},
+        ),
+    )
+
 # Device Model
 class Device(Base):
     __tablename__ = "device"
@@ -55,36 +76,56 @@ class Device(Base):
     connection_status = Column(Enum(ConnectionStatusEnum, values_callable=lambda x: [e.value for e in x]), nullable=False)
     battery_level = Column(Integer, nullable=False)
     creation_date = Column(Date, nullable=False)
+    # Suppression logique : le dispositif est masqué puis purgé en arrière-plan
+    deleted = Column(Boolean, default=False, nullable=False)
+    deleted_at = Column(DateTime, nullable=True)
     # Relationships
     user = relationship("Occupation", back_populates="device")
     positions = relationship("Position", back_populates="device", cascade="all, delete-orphan")
     alerts = relationship("Alert", back_populates="device", cascade="all, delete-orphan")
     components = relationship("Component", back_populates="device", cascade="all, delete-orphan")
+    battery_samples = relationship("BatterySample", back_populates="device", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_device_pending_purge", "serial_number", postgresql_where=deleted),
+    )
 
-# Calendar Model
-class Calendar(Base):
-    __tablename__ = "calendar"
-
-    date = Column(DateTime, primary_key=True, nullable=False, default=datetime.utcnow)
-    occupations = relationship("Occupation", back_populates="calendar", cascade="all, delete")
 
-# Occupation Model
+# Occupation Model : intervalle [start_date, end_date), end_date NULL tant que l'occupation est en cours
 class Occupation(Base):
     __tablename__ = "occupation"
-    device_serial_number = Column(String, ForeignKey("device.serial_number"), primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
-    calendar_date = Column(DateTime, ForeignKey("calendar.date"), primary_key=True, nullable=False)
-    occupied = Column(Boolean, default=True, nullable=False) 
+    id = Column(Integer, primary_key=True, index=True)
+    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    start_date = Column(DateTime, nullable=False, default=datetime.utcnow)
+    end_date = Column(DateTime, nullable=True)
     user = relationship("User", back_populates="devices")
     device = relationship("Device", back_populates="user")
-    calendar = relationship("Calendar", back_populates="occupations")
+
+    __table_args__ = (
+        # Un dispositif n'a qu'un seul détenteur à la fois (index GiST sur les intervalles)
+        ExcludeConstraint(
+            (device_serial_number, "="),
+            (func.tsrange(start_date, end_date), "&&"),
+            name="occupation_no_overlap",
+            using="gist",
+        ),
+        # Pagination par clé (start_date, id) de l'historique d'un dispositif
+        Index("ix_occupation_device_start", device_serial_number, start_date.desc(), id.desc()),
+        # Dispositifs d'un utilisateur
+        Index("ix_occupation_user_start", user_id, start_date.desc()),
+    )
+
+    # Intervalle d'occupation, tel qu'indexé par la contrainte d'exclusion
+    @classmethod
+    def period(cls):
+        return func.tsrange(cls.start_date, cls.end_date)
 
 # Position Model
 class Position(Base):
     __tablename__ = "position"
     id = Column(Integer, primary_key=True, index=True)
-    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), nullable=False)
+    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), nullable=False, index=True)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
     altitude = Column(Float, nullable=True)
@@ -98,7 +139,7 @@ class Position(Base):
 class Alert(Base):
     __tablename__ = "alert"
     id = Column(Integer, primary_key=True, index=True)
-    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), nullable=False)
+    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), nullable=False, index=True)
     message = Column(String, nullable=False)
     date = Column(DateTime, default=datetime.utcnow, nullable=False)
     device = relationship("Device", back_populates="alerts")
@@ -110,7 +151,59 @@ class Component(Base):
     __tablename__ = "component"
     
     id = Column(Integer, primary_key=True, index=True)
-    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), nullable=False)
+    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), nullable=False, index=True)
     type = Column(String, nullable=False)  # Correspond au type du composant
     
-    device = relationship("Device", back_populates="components")
\ No newline at end of file
+    device = relationship("Device", back_populates="components")
+
+    # Un dispositif possède au plus un composant de chaque type
+    __table_args__ = (
+        UniqueConstraint("device_serial_number", "type", name="uq_component_device_type"),
+    )
+
+# Device Stats Model (agrégats maintenus par triggers, cf. db/migrations)
+class DeviceStat(Base):
+    __tablename__ = "device_stats"
+
+    dimension = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Battery Sample Model : historique du niveau de batterie, alimenté par trigger (cf. db/migrations)
+class BatterySample(Base):
+    __tablename__ = "battery_sample"
+
+    id = Column(BigInteger, primary_key=True)
+    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), nullable=False)
+    sampled_at = Column(DateTime, nullable=False, default=datetime.now)
+    battery_level = Column(SmallInteger, nullable=False)
+
+    device = relationship("Device", back_populates="battery_samples")
+
+    __table_args__ = (
+        Index("ix_battery_sample_device_time", device_serial_number, sampled_at),
+        # Table en ajout seul : un index BRIN suffit pour filtrer par fenêtre temporelle
+        Index("ix_battery_sample_sampled_at", sampled_at, postgresql_using="brin"),
+    )
+
+
+# Rollout Model : déploiement par vagues d'une modification groupée
+class Rollout(Base):
+    __tablename__ = "rollout"
+
+    id = Column(Integer, primary_key=True, index=True)
+    changes = Column(JSON, nullable=False)  # Valeurs appliquées à chaque vague
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    devices = relationship("RolloutDevice", back_populates="rollout", cascade="all, delete-orphan")
+
+
+# Rollout Device Model : ensemble cible, figé à la création du déploiement
+class RolloutDevice(Base):
+    __tablename__ = "rollout_device"
+
+    rollout_id = Column(Integer, ForeignKey("rollout.id"), primary_key=True)
+    device_serial_number = Column(Integer, ForeignKey("device.serial_number"), primary_key=True, index=True)
+
+    rollout = relationship("Rollout", back_populates="devices")
@@ -0,0 +1,86 @@
+import logging
+import threading
+from sqlalchemy import select, delete, tuple_
+from db.db_setup import SessionLocal
+from db.models.devices import Device, Occupation, Position, Alert, Component, BatterySample, RolloutDevice
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de lignes supprimées par transaction
+PURGE_BATCH_SIZE = 1000
+# Nombre de dispositifs traités par passe
+PURGE_DEVICES_PER_PASS = 100
+# Intervalle entre deux passes du worker (en secondes)
+PURGE_INTERVAL_SECONDS = 60
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_worker = None
+
+
+def _purge_table(db, key_columns, device_column, serial_numbers, batch_size):
+    # Supprimer les lignes dépendantes par lots bornés, une transaction par lot
+    while True:
+        chunk = select(*key_columns).where(device_column.in_(serial_numbers)).limit(batch_size)
+        result = db.execute(delete(key_columns[0].table).where(tuple_(*key_columns).in_(chunk)))
+        db.commit()
+        if result.rowcount < batch_size:
+            break
+
+
+# Purger les dispositifs supprimés logiquement et leur historique
+def purge_deleted_devices(batch_size=PURGE_BATCH_SIZE):
+    db = SessionLocal()
+    purged = 0
+    try:
+        while True:
+            serial_numbers = db.scalars(
+                select(Device.serial_number)
+                .where(Device.deleted == True)
+                .limit(PURGE_DEVICES_PER_PASS)
+            ).all()
+            if not serial_numbers:
+                break
+
+            for model in (Occupation, Position, Alert, Component, BatterySample, RolloutDevice):
+                key_columns = list(model.__table__.primary_key.columns)
+                _purge_table(db, key_columns, model.device_serial_number, serial_numbers, batch_size)
+
+            db.execute(delete(Device).where(Device.serial_number.in_(serial_numbers), Device.deleted == True))
+            db.commit()
+            purged += len(serial_numbers)
+    finally:
+        db.close()
+    return purged
+
+
+def _run(interval):
+    while not _stop.is_set():
+        try:
+            purged = purge_deleted_devices()
+            if purged:
+                logger.info("Purged %d decommissioned devices", purged)
+        except Exception:
+            logger.exception("Device purge failed")
+        _wakeup.wait(interval)
+        _wakeup.clear()
+
+
+# Démarrer le worker de purge en arrière-plan
+def start_purge_worker(interval=PURGE_INTERVAL_SECONDS):
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    _stop.clear()
+    _worker = threading.Thread(target=_run, args=(interval,), name="device-purge", daemon=True)
+    _worker.start()
+
+
+def stop_purge_worker():
+    _stop.set()
+    _wakeup.set()
+
+
+# Réveiller le worker après une suppression
+def wake_purge_worker():
+    _wakeup.set()
@@ -1,10 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from api import devices, maintainers
+from api import devices, maintainers, users, battery, admission
+from api.admission import AdmissionControlMiddleware, default_route_limits
 from db.db_setup import engine
+from db.purge import start_purge_worker, stop_purge_worker
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_purge_worker()
+    yield
+    stop_purge_worker()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+# Limites de concurrence par route pour protéger le pool de connexions
+app.state.admission_limits = default_route_limits()
+app.add_middleware(AdmissionControlMiddleware, limits=app.state.admission_limits)
 
 app.include_router(devices.router)
-# app.include_router(maintainers.router) 
\ No newline at end of file
+app.include_router(users.router)
+app.include_router(battery.router)
+app.include_router(admission.router)
+# app.include_router(maintainers.router)
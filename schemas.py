@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
 from typing import Optional, List
 from db.models.devices import DeviceTypeEnum, InitialStateEnum, OperationalStatusEnum, ConnectionStatusEnum, SoftwareVersionEnum
@@ -6,7 +6,7 @@ from db.models.devices import DeviceTypeEnum, InitialStateEnum, OperationalStatu
 class ComponentCreate(BaseModel):
     type: str
 
-class DeviceCreateBase(BaseModel):
+class DeviceSyncBase(BaseModel):
     serial_number: int
     type: DeviceTypeEnum
     software_version: SoftwareVersionEnum
@@ -17,6 +17,9 @@ class DeviceCreateBase(BaseModel):
     connection_status: ConnectionStatusEnum
     battery_level: int
     creation_date: date
+
+
+class DeviceCreateBase(DeviceSyncBase):
     user_id: Optional[int] = None
     components: Optional[List[ComponentCreate]] = []
 
@@ -31,4 +34,44 @@ class DeviceUpdateBase(BaseModel):
     connection_status: ConnectionStatusEnum
     battery_level: int
     user_id: Optional[int] = None
-    components: Optional[List[ComponentCreate]] = []
+    # None : composants inchangés ; liste : ensemble complet des composants souhaités
+    components: Optional[List[ComponentCreate]] = None
+
+
+class DevicePatchBase(BaseModel):
+    type: Optional[DeviceTypeEnum] = None
+    software_version: Optional[SoftwareVersionEnum] = None
+    image: Optional[str] = None
+    initial_state: Optional[InitialStateEnum] = None
+    mac_address: Optional[str] = None
+    operational_status: Optional[OperationalStatusEnum] = None
+    connection_status: Optional[ConnectionStatusEnum] = None
+    battery_level: Optional[int] = None
+    # Absent : détenteur inchangé ; null : libérer le dispositif
+    user_id: Optional[int] = None
+    components: Optional[List[ComponentCreate]] = None
+
+
+class DeviceSelectionBase(BaseModel):
+    serial_numbers: Optional[List[int]] = None
+    type: Optional[DeviceTypeEnum] = None
+    software_version: Optional[SoftwareVersionEnum] = None
+    initial_state: Optional[InitialStateEnum] = None
+    operational_status: Optional[OperationalStatusEnum] = None
+    connection_status: Optional[ConnectionStatusEnum] = None
+
+
+class DeviceBulkChangesBase(BaseModel):
+    software_version: Optional[SoftwareVersionEnum] = None
+    operational_status: Optional[OperationalStatusEnum] = None
+    image: Optional[str] = None
+
+
+class DeviceBulkUpdateBase(BaseModel):
+    # Première vague : sélection et modifications ; vagues suivantes : rollout_id seul
+    rollout_id: Optional[int] = None
+    selection: Optional[DeviceSelectionBase] = None
+    changes: Optional[DeviceBulkChangesBase] = None
+    # Déploiement par vagues : taille fixe ou pourcentage cumulé de l'ensemble cible
+    batch_size: Optional[int] = Field(default=None, ge=1)
+    percentage: Optional[float] = Field(default=None, gt=0, le=100)